@@ -9,13 +9,25 @@ Androguard 深度分析器
 """
 
 import sys
+import os
 import json
 import re
+import struct
+import subprocess
 import traceback
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import warnings
 import logging
 
+# orjson（Rust/C 实现）序列化比标准库 json 快 3-10 倍；未安装时回退标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # 禁用所有警告信息
 warnings.filterwarnings('ignore')
 
@@ -46,296 +58,681 @@ except ImportError:
         sys.exit(1)
 
 
-def deep_analyze(apk_path):
-    """深度分析 APK"""
+# ========== 合并匹配模式（URL / 敏感 API / 敏感字符串） ==========
+# 三类模式合并为一个带命名分组的交替正则，对每个 DEX 字符串只扫描一次，
+# 通过 m.lastgroup 区分命中类型（替代原来的三次独立遍历）
+SENSITIVE_APIS = [
+    "getLocation",
+    "getDeviceId",
+    "getSubscriberId",
+    "getSimSerialNumber",
+    "getLine1Number",
+    "execSQL",
+    "rawQuery",
+    "getSharedPreferences",
+    "sendTextMessage",
+]
+
+SENSITIVE_PATTERNS = [
+    r'api[_-]?key',
+    r'secret',
+    r'token',
+    r'password',
+    r'access[_-]?token',
+    r'private[_-]?key',
+]
+
+# 敏感 API 匹配优先使用 Aho–Corasick 自动机（pyahocorasick）：
+# 9 个子串一趟线性扫描完成，O(n+m) 取代逐个子串搜索
+try:
+    import ahocorasick
 
-    start_time = datetime.now()
+    _API_AUTOMATON = ahocorasick.Automaton()
+    for _i, _api in enumerate(SENSITIVE_APIS):
+        _API_AUTOMATON.add_word(_api, (_i, _api))
+    _API_AUTOMATON.make_automaton()
+except ImportError:
+    _API_AUTOMATON = None
 
-    # 基础 APK 对象（快速）
-    apk = APK(apk_path)
+# API 名称保持大小写敏感（原实现用的是 `in` 子串匹配），用 (?-i:...) 局部关闭 IGNORECASE
+_URL_GROUP = r'(?P<url>https?://[^\s"\'<>)}\]]+)'
+_API_GROUP = r'(?P<api>(?-i:' + '|'.join(re.escape(api) for api in SENSITIVE_APIS) + r'))'
+# \b 锚定整词命中，避免在长 base64 串内部误匹配（那类误报会白白占掉 50 条的配额）
+_SENSITIVE_GROUP = r'(?P<sensitive>\b(?:' + '|'.join(SENSITIVE_PATTERNS) + r')\b)'
 
-    # 不使用 AnalyzeAPK（太慢），直接解析 DEX 字符串
-    # a, d, dx = AnalyzeAPK(apk_path)  # 已移除
+# pyahocorasick 不可用时，API 匹配回退到合并正则中的 api 分组
+_MASTER_GROUP_PARTS = [_URL_GROUP, _SENSITIVE_GROUP]
+if _API_AUTOMATON is None:
+    _MASTER_GROUP_PARTS.insert(1, _API_GROUP)
+_MASTER_PATTERN = re.compile('|'.join(_MASTER_GROUP_PARTS), re.IGNORECASE)
 
-    result = {
-        "urls": [],
-        "domains": [],
-        "strings": [],
-        "native_libs": [],
-        "certificates": {},
-        "api_calls": [],
-        "analysis_duration_ms": 0
-    }
-
-    # ========== 1. 提取 URL（从 DEX 字符串常量） ==========
-    url_pattern = re.compile(r'https?://[^\s"\'<>)}\]]+', re.IGNORECASE)
-    urls = set()
-    all_dex_strings = []  # 保存所有 DEX 字符串，供后续使用
+# 原始字节扫描路径（见 iter_dex_strings）：自动机不支持 bytes，始终带 api 分组
+_MASTER_PATTERN_BYTES = re.compile(
+    '|'.join([_URL_GROUP, _API_GROUP, _SENSITIVE_GROUP]).encode('ascii'), re.IGNORECASE)
 
-    # 遍历所有 DEX 文件，直接提取字符串（不反编译代码）
-    for dex_name in apk.get_dex_names():
-        try:
-            dex_bytes = apk.get_file(dex_name)
-            dex = DEX(dex_bytes)
+# 预编译的提取正则（这些调用出现在逐字符串热循环里，避免每次走 re 的编译缓存）
+_HOST = re.compile(r'https?://([^/:?#]+)')   # 从 URL 提取 host
+_PORT = re.compile(r':\d+$')                 # 去除 host 上的端口号
+
+# URL 尾部标点清理：str.rstrip 是单次 C 层调用，等价于 re.sub(r'[...]+$', '')
+_URL_TRAIL_CHARS = '.,;:!?\'")]}>'
 
-            for string_value in dex.get_strings():
-                string_str = str(string_value)
-                all_dex_strings.append(string_str)
+_URL_SRC = r'https?://[^\s"\'<>)}\]]+'
+# 资源文件按原始字节匹配（模式本身是纯 ASCII），避免整文件 decode 的拷贝开销
+_URL_PATTERN_BYTES = re.compile(_URL_SRC.encode('ascii'), re.IGNORECASE)
+
+# 资源文件 URL 扫描引擎：优先 Hyperscan（流式 DFA），其次 google-re2（线性时间），
+# 都不可用时退回内置 re（回溯引擎，大文件上明显更慢）
+try:
+    import hyperscan
+
+    _HS_DB = hyperscan.Database()
+    _HS_DB.compile(
+        expressions=[_URL_SRC.encode('ascii')],
+        ids=[0],
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST],
+    )
+except Exception:
+    _HS_DB = None
+
+try:
+    import re2 as _re2
 
-                if re.match(r'https?://', string_str, re.IGNORECASE):
-                    # 清理 URL（移除尾部的特殊字符）
-                    clean_url = re.sub(r'[.,;:!?\'")\]}>]+$', '', string_str)
-                    if len(clean_url) > 10:  # 最短 URL 长度
-                        urls.add(clean_url)
+    _URL_PATTERN_RE2 = _re2.compile(_URL_SRC.encode('ascii'), _re2.IGNORECASE)
+except ImportError:
+    _URL_PATTERN_RE2 = None
+
+
+def _find_urls(content):
+    """在资源文件原始字节中查找所有 URL，按可用性选择最快的正则引擎
+
+    入参为 bytes，只对命中的片段做解码
+    """
+    if _HS_DB is not None:
+        # Hyperscan 是全匹配语义而非最左最长：每个结束偏移都会回调一次，
+        # 同一个 URL 会报出所有前缀。按起点只保留最大的结束偏移，
+        # 扫描结束后再物化，得到与 re 一致的最长匹配
+        spans = {}
+
+        def _on_match(_id, start, end, _flags, _ctx=None):
+            prev = spans.get(start)
+            if prev is None or end > prev:
+                spans[start] = end
+
+        _HS_DB.scan(content, match_event_handler=_on_match)
+        return [content[start:end].decode('utf-8', errors='ignore')
+                for start, end in sorted(spans.items())]
+
+    pattern = _URL_PATTERN_RE2 if _URL_PATTERN_RE2 is not None else _URL_PATTERN_BYTES
+    return [hit.decode('utf-8', errors='ignore') for hit in pattern.findall(content)]
+
+
+# 流式扫描参数：64 KB 块 + 2 KB 重叠窗口（足以覆盖现实中的任何 URL 长度）
+_SCAN_CHUNK_SIZE = 64 * 1024
+_SCAN_OVERLAP = 2048
+
+# 资源扫描的短路过滤：按条目元信息先行跳过，不读文件内容
+_RESOURCE_SKIP_PREFIXES = ('res/xml/', 'META-INF/', 'assets/flutter_assets/fonts/', 'kotlin/')
+_RESOURCE_MAX_SIZE = 4 * 1024 * 1024  # 超大资产（压缩后的 vendor bundle 等）不值得逐字节扫描
+_RESOURCE_MIN_SIZE = 12               # 比最短可用 URL 还短的文件不可能有结果
+
+
+def _iter_stream_urls(fileobj):
+    """分块扫描文件流中的 URL，峰值内存与文件大小无关
+
+    相邻块之间保留 _SCAN_OVERLAP 字节重叠；落在重叠区内（可能被块边界
+    截断）的匹配不立即产出，并入下一块重新完整匹配，避免截断或重复
+    """
+    tail = b''
+    while True:
+        chunk = fileobj.read(_SCAN_CHUNK_SIZE)
+        if not chunk:
+            # 末尾残留：此时数据完整，可直接整体匹配
+            if tail:
+                yield from _find_urls(tail)
+            return
+
+        buf = tail + chunk
+        cut = len(buf) - _SCAN_OVERLAP
+        if cut <= 0:
+            tail = buf
+            continue
+
+        for m in _URL_PATTERN_BYTES.finditer(buf):
+            if m.end() > cut:
+                # 匹配延伸进重叠区，可能跨块：连同起点一起留到下一轮
+                cut = min(cut, m.start())
+                break
+            yield m.group().decode('utf-8', errors='ignore')
+        tail = buf[cut:]
+
+
+# 无关域名的黑名单（开源库、标准文档、学术网站等）
+_DOMAIN_BLACKLIST = [
+    'apache.org', 'w3.org', 'mozilla.org', 'google.com', 'github.com',
+    'stackoverflow.com', 'wikipedia.org', 'adobe.com', 'microsoft.com',
+    'creativecommons.org', 'color.org', 'jpeg.org', 'ietf.org',
+    'brucelindbloom.com', 'poynton.com', 'rjwagner49.com', 'unicode.org',
+    'xmlpull.org', 'schemas.android.com', 'developer.android.com',
+    'example.com', 'test.com', 'localhost', 'bootcss.com',
+    'bugzil.la', 'bugzilla.mozilla.org', 'crbug.com',
+    'apple.com', 'gstatic.com', 'googleapis.com', 'firebase.google.com',
+    'ubc.ca', 'wolframalpha.com', 'zachstronaut.com', 'math.ubc.ca',
+    '51purse.com'  # PDF阅读器示例域名
+]
+
+# 域名匹配本质是后缀匹配：精确命中查集合，子域名命中用带 tuple 的 str.endswith
+# （单次 C 层调用），替代逐项 `in` 子串扫描；同时修掉子串误伤
+# （如 notgoogle.com.evil.net 以前会被 google.com 命中）
+_BLACKLIST_SET = frozenset(_DOMAIN_BLACKLIST)
+_BLACKLIST_SUFFIXES = tuple('.' + b for b in _DOMAIN_BLACKLIST)
+
+
+# X.509 Name 属性 OID -> 输出字段映射
+# 按 dotted OID 匹配，避免依赖 asn1crypto human_friendly 的显示名称
+_CERT_OID_MAP = {
+    '2.5.4.3': 'developer',           # commonName
+    '2.5.4.10': 'company',            # organizationName
+    '2.5.4.11': 'organization_unit',  # organizationalUnitName
+    '2.5.4.6': 'country',             # countryName
+    '2.5.4.8': 'state',               # stateOrProvinceName
+    '2.5.4.7': 'locality',            # localityName
+}
+
+
+def _extract_name_fields(name):
+    """单次遍历 X.509 Name 的 RDN，按 OID 提取需要的字段"""
+    fields = {}
+    for rdn in name.chosen:
+        for attr in rdn:
+            key = _CERT_OID_MAP.get(attr['type'].dotted)
+            if key is not None:
+                fields[key] = attr['value'].native
+    return fields
+
+
+def _parse_aapt_badging(output):
+    """解析 aapt2 dump badging 输出中的基础信息"""
+    basic_info = {}
+    # package: name='xxx' versionCode='xxx' versionName='xxx'
+    pkg_match = re.search(r"package:\s*name='([^']+)'", output)
+    if pkg_match:
+        basic_info["package_name"] = pkg_match.group(1)
+    ver_code_match = re.search(r"versionCode='([^']+)'", output)
+    if ver_code_match:
+        basic_info["version_code"] = ver_code_match.group(1)
+    ver_name_match = re.search(r"versionName='([^']+)'", output)
+    if ver_name_match:
+        basic_info["version_name"] = ver_name_match.group(1)
+    # application-label:'xxx'
+    app_name_match = re.search(r"application-label:'([^']+)'", output)
+    if app_name_match:
+        basic_info["app_name"] = app_name_match.group(1)
+    # sdkVersion:'xx'
+    min_sdk_match = re.search(r"sdkVersion:'([^']+)'", output)
+    if min_sdk_match:
+        basic_info["min_sdk"] = min_sdk_match.group(1)
+    # targetSdkVersion:'xx'
+    target_sdk_match = re.search(r"targetSdkVersion:'([^']+)'", output)
+    if target_sdk_match:
+        basic_info["target_sdk"] = target_sdk_match.group(1)
+    # launchable-activity: name='xxx'
+    main_activity_match = re.search(r"launchable-activity:\s*name='([^']+)'", output)
+    if main_activity_match:
+        basic_info["main_activity"] = main_activity_match.group(1)
+    return basic_info
+
+
+def _basic_info_androguard(apk):
+    """用 Androguard 提取基础信息（aapt2 不可用或解析失败时的兜底）"""
+    basic_info = {}
+    try:
+        basic_info["package_name"] = apk.get_package() or ""
+        basic_info["version_name"] = apk.get_androidversion_name() or ""
+        basic_info["version_code"] = str(apk.get_androidversion_code()) if apk.get_androidversion_code() else ""
+        basic_info["app_name"] = apk.get_app_name() or ""
+        basic_info["min_sdk"] = str(apk.get_min_sdk_version()) if apk.get_min_sdk_version() else ""
+        basic_info["target_sdk"] = str(apk.get_target_sdk_version()) if apk.get_target_sdk_version() else ""
+        basic_info["main_activity"] = apk.get_main_activity() or ""
+    except Exception:
+        pass  # 静默错误，避免污染 JSON 输出
+    return basic_info
+
+
+def _record_api_hit(api, string_str, api_names, api_ctxs, found_apis):
+    """记录一次敏感 API 命中（去重、限量）
+
+    命中结果存成两个平行数组（SoA），不为每次命中分配 dict，
+    输出 JSON 时再物化成 {"api": ..., "found_in": ...}
+    """
+    if api not in found_apis and len(api_names) < 50:
+        api_names.append(api)
+        api_ctxs.append(string_str[:100] if len(string_str) > 100 else string_str)
+        found_apis.add(api)
+
+
+def _scan_strings(strings, urls, sensitive_strings, api_names, api_ctxs, found_apis):
+    """流式扫描字符串迭代器，就地更新各结果集合
+
+    逐条消费字符串、即扫即弃，任何时刻只持有当前一条，
+    不在内存中保留完整字符串列表
+    """
+    for string_value in strings:
+        string_str = str(string_value)
+
+        for m in _MASTER_PATTERN.finditer(string_str):
+            group = m.lastgroup
+            if group == 'url':
+                # 清理 URL（移除尾部的特殊字符）
+                clean_url = m.group().rstrip(_URL_TRAIL_CHARS)
+                if len(clean_url) > 10:  # 最短 URL 长度
+                    urls.add(clean_url)
+            elif group == 'api':
+                _record_api_hit(m.group(), string_str, api_names, api_ctxs, found_apis)
+            elif group == 'sensitive':
+                # 限制长度，避免过长字符串
+                if 10 < len(string_str) < 200:
+                    sensitive_strings.add(string_str)
+
+        if _API_AUTOMATON is not None:
+            for _, (_, api) in _API_AUTOMATON.iter(string_str):
+                _record_api_hit(api, string_str, api_names, api_ctxs, found_apis)
+
+
+def iter_dex_strings(buf):
+    """直接从 DEX 字节流提取字符串表，跳过完整的 DEX 解析
+
+    只读取 header 里的 string_ids_size/string_ids_off（偏移 0x38），
+    逐个定位 string_data_item（ULEB128 长度 + MUTF-8 数据 + 0x00 结尾），
+    不解析 class_defs/method/code 等无关结构。
+    产出原始字节切片，不做 MUTF-8 解码（正则直接在 bytes 上匹配）
+    """
+    if len(buf) < 0x70 or buf[:4] != b'dex\n':
+        raise ValueError("not a dex file")
+
+    string_ids_size, string_ids_off = struct.unpack_from('<II', buf, 0x38)
+    ids_end = string_ids_off + 4 * string_ids_size
+    if ids_end > len(buf):
+        raise ValueError("truncated string_ids section")
+
+    for (data_off,) in struct.iter_unpack('<I', buf[string_ids_off:ids_end]):
+        # 跳过 ULEB128 编码的 utf16_size，取到 0x00 结尾为止的原始字节
+        p = data_off
+        while buf[p] & 0x80:
+            p += 1
+        p += 1
+        yield buf[p:buf.index(b'\x00', p)]
+
+
+def _scan_dex_raw(dex_bytes, urls, sensitive_strings, api_names, api_ctxs, found_apis):
+    """基于原始字节的 DEX 字符串扫描（_scan_strings 的 bytes 版本）
+
+    只对命中的少量字符串做解码，未命中的字符串零拷贝零解码
+    """
+    for raw in iter_dex_strings(dex_bytes):
+        for m in _MASTER_PATTERN_BYTES.finditer(raw):
+            group = m.lastgroup
+            if group == 'url':
+                # 清理 URL（移除尾部的特殊字符）
+                clean_url = m.group().decode('utf-8', errors='ignore').rstrip(_URL_TRAIL_CHARS)
+                if len(clean_url) > 10:  # 最短 URL 长度
+                    urls.add(clean_url)
+            elif group == 'api':
+                _record_api_hit(m.group().decode('ascii'),
+                                raw[:100].decode('utf-8', errors='ignore'),
+                                api_names, api_ctxs, found_apis)
+            elif group == 'sensitive':
+                # 限制长度，避免过长字符串
+                if 10 < len(raw) < 200:
+                    sensitive_strings.add(raw.decode('utf-8', errors='ignore'))
+
+
+def _scan_dex(dex_bytes):
+    """扫描单个 DEX 的字符串表（可作为子进程入口，参数/返回值均可 pickle）
+
+    优先走原始字节扫描（比 Androguard 完整解析快一个量级），
+    解析异常（加固/畸形 DEX）时回退 Androguard DEX 对象。
+    返回 (urls, sensitive_strings, api_names, api_ctxs)
+    """
+    urls = set()
+    sensitive_strings = set()
+    api_names = []
+    api_ctxs = []
+    found_apis = set()
+    try:
+        _scan_dex_raw(dex_bytes, urls, sensitive_strings, api_names, api_ctxs, found_apis)
+    except Exception:
+        try:
+            dex = DEX(dex_bytes)
+            _scan_strings(dex.get_strings(), urls, sensitive_strings, api_names, api_ctxs, found_apis)
         except Exception:
             pass  # 静默错误，避免污染 JSON 输出
+    return urls, sensitive_strings, api_names, api_ctxs
 
-    # ========== 3. 提取 URL（从资源文件）NEW! ==========
-    try:
-        files = apk.get_files()
-        # 只搜索文本文件（XML, JSON, TXT, properties等）
-        text_extensions = ['.xml', '.json', '.txt', '.properties', '.html', '.js', '.css']
-        text_files = [f for f in files if any(f.endswith(ext) for ext in text_extensions)]
 
-        # 搜索所有文本文件（无限制）
-        for file_path in text_files:
-            try:
-                # 跳过明显的系统文件
-                if any(skip in file_path for skip in ['schemas.android.com', 'AndroidManifest']):
-                    continue
+# 常驻服务模式下同一 APK 可能被重复分析（重试、reanalyze）：
+# 缓存最近解析的 APK 对象，按 (路径, mtime, size) 失效
+_APK_CACHE = OrderedDict()
+_APK_CACHE_SIZE = 4
 
-                content = apk.get_file(file_path).decode('utf-8', errors='ignore')
-                found_urls = url_pattern.findall(content)
 
-                for url in found_urls:
-                    # 过滤掉 Android 系统 schema URL
-                    if 'schemas.android.com' in url:
-                        continue
+def _get_apk(apk_path):
+    """获取（可能来自缓存的）Androguard APK 对象"""
+    try:
+        st = os.stat(apk_path)
+        key = (apk_path, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return APK(apk_path)
+
+    apk = _APK_CACHE.get(key)
+    if apk is None:
+        apk = APK(apk_path)
+        _APK_CACHE[key] = apk
+        if len(_APK_CACHE) > _APK_CACHE_SIZE:
+            _APK_CACHE.popitem(last=False)
+    else:
+        _APK_CACHE.move_to_end(key)
+    return apk
 
-                    clean_url = re.sub(r'[.,;:!?\'")\]}>]+$', '', url)
-                    if len(clean_url) > 10 and not clean_url.endswith('/apk/res'):
-                        urls.add(clean_url)
-            except:
-                continue
-    except Exception as e:
-        pass  # 静默错误，避免污染 JSON 输出
 
-    result["urls"] = sorted(list(urls))
-
-    # ========== 4. 提取域名（过滤无关域名） ==========
-    # 无关域名的黑名单（开源库、标准文档、学术网站等）
-    domain_blacklist = [
-        'apache.org', 'w3.org', 'mozilla.org', 'google.com', 'github.com',
-        'stackoverflow.com', 'wikipedia.org', 'adobe.com', 'microsoft.com',
-        'creativecommons.org', 'color.org', 'jpeg.org', 'ietf.org',
-        'brucelindbloom.com', 'poynton.com', 'rjwagner49.com', 'unicode.org',
-        'xmlpull.org', 'schemas.android.com', 'developer.android.com',
-        'example.com', 'test.com', 'localhost', 'bootcss.com',
-        'bugzil.la', 'bugzilla.mozilla.org', 'crbug.com',
-        'apple.com', 'gstatic.com', 'googleapis.com', 'firebase.google.com',
-        'ubc.ca', 'wolframalpha.com', 'zachstronaut.com', 'math.ubc.ca',
-        '51purse.com'  # PDF阅读器示例域名
-    ]
-
-    domains = set()
-    for url in urls:
-        match = re.search(r'https?://([^/:?#]+)', url)
-        if match:
-            domain = match.group(1)
-            # 移除端口号
-            domain = re.sub(r':\d+$', '', domain)
-
-            # 过滤无效域名
-            if domain in ['a', 'b', 'c']:  # 单字母域名
-                continue
-
-            # 过滤黑名单中的域名
-            if any(blacklist in domain for blacklist in domain_blacklist):
-                continue
-
-            # 过滤明显的路径片段（误识别为域名的）
-            if '\\' in domain or domain.startswith('/'):
-                continue
-
-            domains.add(domain)
-
-    result["domains"] = sorted(list(domains))
-
-    # ========== 5. 提取敏感字符串（可选） ==========
-    sensitive_patterns = [
-        r'api[_-]?key',
-        r'secret',
-        r'token',
-        r'password',
-        r'access[_-]?token',
-        r'private[_-]?key',
-    ]
+def deep_analyze(apk_path):
+    """深度分析 APK"""
 
-    sensitive_strings = set()
-    try:
-        # 使用之前收集的 DEX 字符串
-        for string_str in all_dex_strings:
-            for pattern in sensitive_patterns:
-                if re.search(pattern, string_str, re.IGNORECASE):
-                    # 限制长度，避免过长字符串
-                    if 10 < len(string_str) < 200:
-                        sensitive_strings.add(string_str)
-                        break
-    except Exception as e:
-        pass  # 静默错误，避免污染 JSON 输出
+    start_time = datetime.now()
 
-    result["strings"] = sorted(list(sensitive_strings))[:50]  # 限制数量
+    # 基础 APK 对象（快速）
+    apk = _get_apk(apk_path)
 
-    # ========== 6. 提取 Native 库 ==========
+    # APK 本身就是 ZIP：单独用 zipfile 打开一次（central directory 只解析一次），
+    # 避免 Androguard get_files()/get_file() 每次调用都重新检索条目
     try:
-        result["native_libs"] = apk.get_libraries()
-    except Exception as e:
-        result["native_libs"] = []  # 静默错误，避免污染 JSON 输出
+        zf = zipfile.ZipFile(apk_path)
+    except Exception:
+        zf = None  # 异常 ZIP 时回退到 Androguard 的文件访问接口
 
-    # ========== 7. 提取证书信息 ==========
+    # aapt2 解析 badging 远快于 Androguard：先异步启动子进程，
+    # 让它的 I/O 与下面 DEX 扫描的 CPU 工作重叠，第 9 步再收取结果
     try:
-        certs = apk.get_certificates()
-        if certs and len(certs) > 0:
-            cert = certs[0]  # asn1crypto.x509.Certificate 对象
-
-            # 解析 subject 获取 CN (开发者) 和 O (公司)
-            subject_dict = {}
-            issuer_dict = {}
-
-            # 从 subject 提取字段
-            if hasattr(cert, 'subject') and cert.subject:
-                for rdn in cert.subject.chosen:
-                    for attr in rdn:
-                        attr_type = attr['type'].human_friendly
-                        attr_value = attr['value'].native
-                        subject_dict[attr_type] = attr_value
-
-            # 从 issuer 提取字段
-            if hasattr(cert, 'issuer') and cert.issuer:
-                for rdn in cert.issuer.chosen:
-                    for attr in rdn:
-                        attr_type = attr['type'].human_friendly
-                        attr_value = attr['value'].native
-                        issuer_dict[attr_type] = attr_value
-
-            result["certificates"] = {
-                "subject": cert.subject.human_friendly if hasattr(cert.subject, 'human_friendly') else "",
-                "issuer": cert.issuer.human_friendly if hasattr(cert.issuer, 'human_friendly') else "",
-                "serial": str(cert.serial_number) if hasattr(cert, 'serial_number') else "",
-                "not_before": cert.not_valid_before.isoformat() if hasattr(cert, 'not_valid_before') and cert.not_valid_before else "",
-                "not_after": cert.not_valid_after.isoformat() if hasattr(cert, 'not_valid_after') and cert.not_valid_after else "",
-                # 直接提供解析后的字段，方便 Go 端使用
-                "developer": subject_dict.get("Common Name", ""),
-                "company": subject_dict.get("Organization", ""),
-                "organization_unit": subject_dict.get("Organizational Unit", ""),
-                "country": subject_dict.get("Country", ""),
-                "state": subject_dict.get("State/Province", ""),
-                "locality": subject_dict.get("Locality", ""),
-            }
-    except Exception as e:
-        result["certificates"] = {}  # 静默错误，避免污染 JSON 输出
-
-    # ========== 8. 提取敏感 API 调用（从字符串中匹配） ==========
-    # 不再遍历方法（太慢），改为从字符串中查找 API 引用
-    sensitive_apis = [
-        "getLocation",
-        "getDeviceId",
-        "getSubscriberId",
-        "getSimSerialNumber",
-        "getLine1Number",
-        "execSQL",
-        "rawQuery",
-        "getSharedPreferences",
-        "sendTextMessage",
-    ]
-
-    api_calls = []
+        aapt_proc = subprocess.Popen(
+            ["aapt2", "dump", "badging", apk_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except Exception:
+        aapt_proc = None  # aapt2 不可用，基础信息回退 Androguard
+
+    # 不使用 AnalyzeAPK（太慢），直接解析 DEX 字符串
+    # a, d, dx = AnalyzeAPK(apk_path)  # 已移除
+
     try:
+        result = {
+            "urls": [],
+            "domains": [],
+            "strings": [],
+            "native_libs": [],
+            "certificates": {},
+            "api_calls": [],
+            "analysis_duration_ms": 0
+        }
+
+        # ========== 1. 扫描 DEX 字符串（URL / 敏感字符串 / 敏感 API 一次扫完） ==========
+        urls = set()
+        sensitive_strings = set()
+        api_names = []
+        api_ctxs = []
         found_apis = set()
-        for string_str in all_dex_strings:
-            for api in sensitive_apis:
-                if api in string_str and api not in found_apis:
-                    api_calls.append({
-                        "api": api,
-                        "found_in": string_str[:100] if len(string_str) > 100 else string_str,
-                    })
-                    found_apis.add(api)
-                    if len(api_calls) >= 50:
-                        break
-            if len(api_calls) >= 50:
-                break
-    except Exception as e:
-        pass  # 静默错误，避免污染 JSON 输出
 
-    result["api_calls"] = api_calls[:50]
+        # 遍历所有 DEX 文件，直接提取字符串（不反编译代码）
+        # 单次流式遍历即完成三类匹配，不保留字符串列表（大 APK 可达数十万条，常驻内存开销巨大）
+        all_dex_bytes = []
+        for dex_name in apk.get_dex_names():
+            try:
+                all_dex_bytes.append(zf.read(dex_name) if zf is not None else apk.get_file(dex_name))
+            except Exception:
+                pass  # 静默错误，避免污染 JSON 输出
 
-    # ========== 9. 提取基础信息 ==========
-    basic_info = {}
-    try:
-        basic_info["package_name"] = apk.get_package() or ""
-        basic_info["version_name"] = apk.get_androidversion_name() or ""
-        basic_info["version_code"] = str(apk.get_androidversion_code()) if apk.get_androidversion_code() else ""
-        basic_info["app_name"] = apk.get_app_name() or ""
-        basic_info["min_sdk"] = str(apk.get_min_sdk_version()) if apk.get_min_sdk_version() else ""
-        basic_info["target_sdk"] = str(apk.get_target_sdk_version()) if apk.get_target_sdk_version() else ""
-        basic_info["main_activity"] = apk.get_main_activity() or ""
-    except Exception as e:
-        pass  # 静默错误，避免污染 JSON 输出
+        # 多 DEX（>64k 方法的应用很常见）时并行解析，DEX 解析是 CPU 密集型且彼此独立
+        if len(all_dex_bytes) > 1:
+            try:
+                max_workers = min(len(all_dex_bytes), os.cpu_count() or 1)
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    scan_results = list(executor.map(_scan_dex, all_dex_bytes))
+            except Exception:
+                # 子进程不可用（如受限环境）时退回串行扫描
+                scan_results = [_scan_dex(dex_bytes) for dex_bytes in all_dex_bytes]
+        else:
+            scan_results = [_scan_dex(dex_bytes) for dex_bytes in all_dex_bytes]
+
+        # 合并各 DEX 的扫描结果
+        for dex_urls, dex_sensitive, dex_api_names, dex_api_ctxs in scan_results:
+            urls |= dex_urls
+            sensitive_strings |= dex_sensitive
+            for api, ctx in zip(dex_api_names, dex_api_ctxs):
+                _record_api_hit(api, ctx, api_names, api_ctxs, found_apis)
+
+        # ========== 3. 提取 URL（从资源文件）NEW! ==========
+        try:
+            # 只搜索文本文件（XML, JSON, TXT, properties等）
+            text_extensions = ('.xml', '.json', '.txt', '.properties', '.html', '.js', '.css')
+            # 按扩展名 + 大小 + 路径前缀预筛，长尾的超大/无关资产连读都不读
+            if zf is not None:
+                text_files = [info.filename for info in zf.infolist()
+                              if info.filename.endswith(text_extensions)
+                              and _RESOURCE_MIN_SIZE <= info.file_size <= _RESOURCE_MAX_SIZE
+                              and not info.filename.startswith(_RESOURCE_SKIP_PREFIXES)]
+            else:
+                text_files = [f for f in apk.get_files()
+                              if f.endswith(text_extensions)
+                              and not f.startswith(_RESOURCE_SKIP_PREFIXES)]
+
+            # 重复 URL 前置过滤：压缩后的 JS/JSON 里同一 CDN URL 可能出现上千次，
+            # 用 64 位哈希集合在清洗/过滤之前就挡掉重复项（整数集合远比长字符串集合省内存）
+            seen_url_hashes = set()
+
+            # 搜索所有文本文件（无限制）
+            for file_path in text_files:
+                try:
+                    # 跳过明显的系统文件
+                    if any(skip in file_path for skip in ['schemas.android.com', 'AndroidManifest']):
+                        continue
+
+                    # 直接在原始字节上分块流式匹配，大体积 JS bundle 也不会整文件载入
+                    if zf is not None:
+                        with zf.open(file_path) as f:
+                            found_urls = list(_iter_stream_urls(f))
+                    else:
+                        found_urls = _find_urls(apk.get_file(file_path))
+
+                    for url in found_urls:
+                        url_hash = hash(url)
+                        if url_hash in seen_url_hashes:
+                            continue
+                        seen_url_hashes.add(url_hash)
+
+                        # 过滤掉 Android 系统 schema URL
+                        if 'schemas.android.com' in url:
+                            continue
+
+                        clean_url = url.rstrip(_URL_TRAIL_CHARS)
+                        if len(clean_url) > 10 and not clean_url.endswith('/apk/res'):
+                            urls.add(clean_url)
+                except:
+                    continue
+        except Exception as e:
+            pass  # 静默错误，避免污染 JSON 输出
+
+        result["urls"] = sorted(list(urls))
 
-    # ========== 9.1 aapt2 回退：如果 Androguard 解析失败，尝试用 aapt2 ==========
-    if not basic_info.get("package_name"):
+        # ========== 4. 提取域名（过滤无关域名） ==========
+        domains = set()
+        for url in urls:
+            match = _HOST.search(url)
+            if match:
+                domain = match.group(1)
+                # 移除端口号
+                domain = _PORT.sub('', domain)
+
+                # 过滤无效域名
+                if domain in ['a', 'b', 'c']:  # 单字母域名
+                    continue
+
+                # 过滤黑名单中的域名（精确命中或黑名单项的子域名）
+                if domain in _BLACKLIST_SET or domain.endswith(_BLACKLIST_SUFFIXES):
+                    continue
+
+                # 过滤明显的路径片段（误识别为域名的）
+                if '\\' in domain or domain.startswith('/'):
+                    continue
+
+                domains.add(domain)
+
+        result["domains"] = sorted(list(domains))
+
+        # ========== 5. 敏感字符串（已在 DEX 扫描中收集） ==========
+        result["strings"] = sorted(list(sensitive_strings))[:50]  # 限制数量
+
+        # ========== 6. 提取 Native 库 ==========
         try:
-            import subprocess
-            # 尝试使用 aapt2 dump badging
-            aapt_result = subprocess.run(
-                ["aapt2", "dump", "badging", apk_path],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if aapt_result.returncode == 0:
-                output = aapt_result.stdout
-                # 解析 package: name='xxx' versionCode='xxx' versionName='xxx'
-                # re 已在文件顶部导入
-                pkg_match = re.search(r"package:\s*name='([^']+)'", output)
-                if pkg_match:
-                    basic_info["package_name"] = pkg_match.group(1)
-                ver_code_match = re.search(r"versionCode='([^']+)'", output)
-                if ver_code_match:
-                    basic_info["version_code"] = ver_code_match.group(1)
-                ver_name_match = re.search(r"versionName='([^']+)'", output)
-                if ver_name_match:
-                    basic_info["version_name"] = ver_name_match.group(1)
-                # application-label:'xxx'
-                app_name_match = re.search(r"application-label:'([^']+)'", output)
-                if app_name_match:
-                    basic_info["app_name"] = app_name_match.group(1)
-                # sdkVersion:'xx'
-                min_sdk_match = re.search(r"sdkVersion:'([^']+)'", output)
-                if min_sdk_match:
-                    basic_info["min_sdk"] = min_sdk_match.group(1)
-                # targetSdkVersion:'xx'
-                target_sdk_match = re.search(r"targetSdkVersion:'([^']+)'", output)
-                if target_sdk_match:
-                    basic_info["target_sdk"] = target_sdk_match.group(1)
-                # launchable-activity: name='xxx'
-                main_activity_match = re.search(r"launchable-activity:\s*name='([^']+)'", output)
-                if main_activity_match:
-                    basic_info["main_activity"] = main_activity_match.group(1)
-        except Exception:
-            pass  # aapt2 也失败了，静默
+            result["native_libs"] = apk.get_libraries()
+        except Exception as e:
+            result["native_libs"] = []  # 静默错误，避免污染 JSON 输出
 
-    result["basic_info"] = basic_info
+        # ========== 7. 提取证书信息 ==========
+        try:
+            # 解析一次证书链并复用（ASN.1 解析开销大，避免重复调用 get_certificates）
+            certs = apk.get_certificates()
+            if certs and len(certs) > 0:
+                cert = certs[0]  # asn1crypto.x509.Certificate 对象
+
+                # 解析 subject 获取 CN (开发者) 和 O (公司)，单次遍历按 OID 提取
+                subject_fields = {}
+                if hasattr(cert, 'subject') and cert.subject:
+                    subject_fields = _extract_name_fields(cert.subject)
+
+                result["certificates"] = {
+                    "subject": cert.subject.human_friendly if hasattr(cert.subject, 'human_friendly') else "",
+                    "issuer": cert.issuer.human_friendly if hasattr(cert.issuer, 'human_friendly') else "",
+                    "serial": str(cert.serial_number) if hasattr(cert, 'serial_number') else "",
+                    "not_before": cert.not_valid_before.isoformat() if hasattr(cert, 'not_valid_before') and cert.not_valid_before else "",
+                    "not_after": cert.not_valid_after.isoformat() if hasattr(cert, 'not_valid_after') and cert.not_valid_after else "",
+                    # 直接提供解析后的字段，方便 Go 端使用
+                    "developer": subject_fields.get("developer", ""),
+                    "company": subject_fields.get("company", ""),
+                    "organization_unit": subject_fields.get("organization_unit", ""),
+                    "country": subject_fields.get("country", ""),
+                    "state": subject_fields.get("state", ""),
+                    "locality": subject_fields.get("locality", ""),
+                }
+        except Exception as e:
+            result["certificates"] = {}  # 静默错误，避免污染 JSON 输出
+
+        # ========== 8. 敏感 API 调用（已在 DEX 扫描中收集） ==========
+        # 不再遍历方法（太慢），也不再重扫字符串表；此处才物化成 dict（与 Go 端结构保持一致）
+        result["api_calls"] = [
+            {"api": api, "found_in": ctx} for api, ctx in zip(api_names, api_ctxs)
+        ]
+
+        # ========== 9. 提取基础信息（aapt2 优先，Androguard 兜底） ==========
+        # aapt2 子进程在分析开始时已异步启动，这里只收取结果
+        basic_info = {}
+        if aapt_proc is not None:
+            try:
+                output, _ = aapt_proc.communicate(timeout=30)
+                if aapt_proc.returncode == 0:
+                    basic_info = _parse_aapt_badging(output)
+            except Exception:
+                try:
+                    aapt_proc.kill()
+                    aapt_proc.wait()  # 回收超时的子进程，避免僵尸
+                except Exception:
+                    pass
+
+        # aapt2 不可用或没解析出包名时，回退 Androguard
+        if not basic_info.get("package_name"):
+            basic_info.update(_basic_info_androguard(apk))
+
+        result["basic_info"] = basic_info
+
+        # ========== 10. 记录耗时 ==========
+        duration = (datetime.now() - start_time).total_seconds() * 1000
+        result["analysis_duration_ms"] = int(duration)
+
+        return result
+    finally:
+        # 常驻服务模式（analyze_worker）会吞掉本函数的异常并继续处理下一个任务，
+        # 资源必须在此兜底释放，否则每个失败输入都会泄漏 fd / 僵尸子进程
+        if zf is not None:
+            try:
+                zf.close()
+            except Exception:
+                pass
+        if aapt_proc is not None and aapt_proc.poll() is None:
+            try:
+                aapt_proc.kill()
+                aapt_proc.wait()
+            except Exception:
+                pass
+
+
+def _print_json(obj):
+    """输出 JSON 结果到 stdout（优先 orjson）
+
+    不缩进（Go 端 json.Unmarshal 不需要，缩进会让大结果的输出近乎翻倍）；
+    标准库路径用 json.dump 流式写出，不在内存里拼整块字符串
+    """
+    if orjson is not None:
+        sys.stdout.buffer.write(orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE))
+        sys.stdout.buffer.flush()
+    else:
+        json.dump(obj, sys.stdout, ensure_ascii=False)
+        sys.stdout.write('\n')
+        sys.stdout.flush()
+
+
+def _print_json_line(obj):
+    """输出单行 JSON + 换行（服务模式下 Go 端按行读取结果）"""
+    if orjson is not None:
+        sys.stdout.buffer.write(orjson.dumps(obj) + b'\n')
+        sys.stdout.buffer.flush()
+    else:
+        sys.stdout.write(json.dumps(obj, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+
+def analyze_worker():
+    """服务模式：常驻进程，从 stdin 逐行读任务、向 stdout 逐行回结果
+
+    协议与 Go 端进程池对应（internal/staticanalysis/process_pool.go）：
+    每行一个 {"apk_path": "..."}（也接受裸路径），每个任务回一行 JSON。
+    常驻复用免去了每个 APK 约 1 秒的 Python + Androguard 冷启动
+    """
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
 
-    # ========== 10. 记录耗时 ==========
-    duration = (datetime.now() - start_time).total_seconds() * 1000
-    result["analysis_duration_ms"] = int(duration)
+        try:
+            if line.startswith('{'):
+                apk_path = json.loads(line).get("apk_path", "")
+            else:
+                apk_path = line
+            result = deep_analyze(apk_path)
+        except Exception as e:
+            result = {
+                "error": str(e),
+                "traceback": traceback.format_exc()
+            }
 
-    return result
+        _print_json_line(result)
 
 
 def main():
     """主函数"""
+    if "--server-mode" in sys.argv[1:]:
+        analyze_worker()
+        return
+
     if len(sys.argv) != 2:
         print(json.dumps({
             "error": "Usage: python androguard_deep_analyzer.py <apk_path>"
@@ -346,13 +743,13 @@ def main():
 
     try:
         result = deep_analyze(apk_path)
-        print(json.dumps(result, ensure_ascii=False, indent=2))
+        _print_json(result)
     except Exception as e:
         error_result = {
             "error": str(e),
             "traceback": traceback.format_exc()
         }
-        print(json.dumps(error_result, ensure_ascii=False, indent=2))
+        _print_json(error_result)
         sys.exit(1)
 
 